@@ -1,14 +1,46 @@
+import functools
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import backtrader as bt
 import yfinance as yf
+import numpy as np
 import pandas as pd
 import requests_cache
 from tabulate import tabulate  # Import tabulate for table formatting
 
+# Use the ahead-of-time compiled kernels if built (python _kernels.py), else the JIT ones
+try:
+    from bt_kernels import ema, max_drawdown
+except ImportError:
+    from _kernels import ema, max_drawdown
+
 # Set up session caching for yfinance
 yf.set_tz_cache_location("custom/cache/location")
 session = requests_cache.CachedSession('yfinance.cache')
 session.headers['User-agent'] = 'my-program/1.0'
 
+# Download each symbol once per process; run_backtest() is called for several
+# MAX values over the same data, so later calls are served from memory
+@functools.lru_cache(maxsize=None)
+def _download(symbol, start, end, interval):
+    return yf.download(symbol, start=start, end=end, interval=interval, progress=False)
+
+# Add the EMA 89 of high and low as columns, fed to Backtrader through EMAPandasData
+def add_ema(data_df, period=89):
+    data_df['ema_high'] = ema(data_df['high'].to_numpy(dtype=np.float64, copy=True), period)
+    data_df['ema_low'] = ema(data_df['low'].to_numpy(dtype=np.float64, copy=True), period)
+    return data_df
+
+# Pandas data feed with the precomputed EMA columns as extra lines
+class EMAPandasData(bt.feeds.PandasData):
+    lines = ('ema_high', 'ema_low')
+    params = (
+        ('ema_high', -1),  # Autodetect the column by name
+        ('ema_low', -1),
+    )
+
 class TestStrategy(bt.Strategy):
     params = (
         ('MAX', None),  # Add MAX as a parameter
@@ -19,42 +51,44 @@ class TestStrategy(bt.Strategy):
         dt = dt or self.datas[0].datetime.date(0)
     
     def __init__(self):
-        # Initialize the EMAs for high and low prices
-        self.ema_high = bt.indicators.ExponentialMovingAverage(self.datas[0].high, period=89)
-        self.ema_low = bt.indicators.ExponentialMovingAverage(self.datas[0].low, period=89)
+        # EMAs for high and low prices, precomputed as lines of the data feed
+        self.ema_high = self.datas[0].ema_high
+        self.ema_low = self.datas[0].ema_low
         self.dataclose = self.datas[0].close
         self.datalow = self.datas[0].low
         self.datahigh = self.datas[0].high
+        
+        # Precompute buy/sell signals for all preloaded bars in one vectorized pass
+        self.buy_signal = np.asarray(self.datalow.array) > np.asarray(self.ema_high.array)  # Low above EMA 89 of high
+        self.sell_signal = np.asarray(self.datahigh.array) < np.asarray(self.ema_low.array)  # High below EMA 89 of low
         self.open_trade_profit = 0  # Track open trade profit
         self.trade_count = 0  # Counter for number of trades
-        self.open_positions = []  # Track open positions
+        self.open_positions = deque()  # Track open positions (oldest first)
         
         # Use the MAX parameter passed during initialization
         self.MAX = self.params.MAX
         
-        # For MDD calculation
-        self.equity_curve = []  # To store portfolio value at each step
+        # For MDD calculation: preallocate one raw double per bar of the preloaded data
+        self.equity_curve = np.empty(self.datas[0].buflen(), dtype=np.float64)  # Portfolio value at each step
+        self.equity_count = 0  # Number of filled slots in equity_curve
     
     def stop(self):
         # Calculate MDD after the backtest ends
-        equity_curve = pd.Series(self.equity_curve)
-        cumulative_returns = equity_curve / equity_curve.iloc[0]
-        peak = cumulative_returns.cummax()
-        drawdown = (cumulative_returns - peak) / peak
-        self.max_drawdown = drawdown.min() * 100  # Maximum Drawdown in percentage    
+        self.max_drawdown = max_drawdown(self.equity_curve[:self.equity_count])  # Maximum Drawdown in percentage
     
     def next(self):
-        # Calculate portfolio value (cash + unrealized PnL)
-        portfolio_value = self.broker.getvalue()        
+        # Store portfolio value (cash + unrealized PnL) in the equity curve
+        self.equity_curve[self.equity_count] = self.broker.getvalue()
+        self.equity_count += 1
         
-        # Append portfolio value to equity curve
-        self.equity_curve.append(portfolio_value)
+        # Index of the current bar in the precomputed signal arrays
+        bar = len(self) - 1
         
         # Buy if close above EMA 89 of high
-        if self.datalow[0] > self.ema_high[0]:
+        if self.buy_signal[bar]:
             if not self.position:
                 cash = self.broker.getcash()
-                size = float(cash / self.datalow[0] / self.MAX)
+                size = cash / self.datalow[0] / self.MAX
                 self.log(f'BUY CREATE, Price: {self.datalow[0]:.2f}, Size: {size}')
                 self.buy(size=size)
                 self.open_positions.append(self.datalow[0])
@@ -63,18 +97,18 @@ class TestStrategy(bt.Strategy):
                 # Check if the price is higher than the last entry
                 if self.datalow[0] > self.open_positions[-1]:
                     cash = self.broker.getcash()
-                    size = float(cash / self.dataclose[0] / self.MAX)
+                    size = cash / self.dataclose[0] / self.MAX
                     self.log(f'BUY ADDITIONAL POSITION, Price: {self.dataclose[0]:.2f}, Size: {size}')
                     self.buy(size=size)
                     self.open_positions.append(self.dataclose[0])
                     self.trade_count += 1
         
         # Sell if close below EMA 89 of low
-        elif self.datahigh[0] < self.ema_low[0] and self.datalow[0] <= self.position.price:
+        elif self.sell_signal[bar] and self.datalow[0] <= self.position.price:
             if self.position:
                 self.log(f'SELL CREATE, Price: {self.datahigh[0]:.2f}')
                 self.sell(size=self.position.size)
-                self.open_positions.pop(0)
+                self.open_positions.popleft()
                 self.trade_count += 1
 
 def resample_data(data_df, timeframe):
@@ -85,109 +119,122 @@ def resample_data(data_df, timeframe):
         'close': 'last',
         'volume': 'sum'
     }
-    return data_df.resample(timeframe).apply(ohlc_dict).dropna()
+    return data_df.resample(timeframe).agg(ohlc_dict).dropna()
+
+# List of symbols and the timeframes resampled from the hourly data
+SYMBOLS = ['BTC-USD', 'ETH-USD', 'LINK-USD']
+TIMEFRAMES = {'1D': '1D', '4H': '4h', '8H': '8h'}
+
+# Prepare the data for every timeframe of one symbol (once per process)
+@functools.lru_cache(maxsize=None)
+def load_frames(symbol):
+    # Download hourly data using yfinance (cached, so copy before modifying)
+    data_df = _download(symbol, '2024-01-01', '2025-01-01', '1h').copy()
+    
+    # Handle Multi-Level Index
+    if isinstance(data_df.columns, pd.MultiIndex):
+        data_df.columns = data_df.columns.get_level_values(0)
+    
+    # Convert column names to lowercase for Backtrader
+    data_df.columns = [col.lower() for col in data_df.columns]
+    
+    # Backtrader stores line values as doubles, so float64 throughout loses no precision
+    data_df = data_df.astype(np.float64)
+    
+    # Resample the single hourly download to each timeframe
+    return {tf_name: add_ema(resample_data(data_df, tf_interval)) for tf_name, tf_interval in TIMEFRAMES.items()}
+
+# Initial cash for every backtest
+INITIAL_VALUE = 100000.0
+
+# Apply the broker settings shared by every backtest
+def _configure(cerebro):
+    # Set initial cash
+    cerebro.broker.setcash(INITIAL_VALUE)
+
+    # Set commission to 0.1%
+    cerebro.broker.setcommission(commission=0.001)
+
+# Data frames handed to each worker process, keyed by (symbol, timeframe name)
+_frames = {}
+
+def _init_worker(frames):
+    _frames.update(frames)
+
+# Run a single backtest and return its row for the results table
+def _one(max_trades, symbol, tf_name):
+    data_df = _frames[(symbol, tf_name)]
+    
+    # Initialize a fresh Cerebro so each backtest runs over its own single data feed
+    cerebro = bt.Cerebro()
+    
+    # Create Backtrader Data Feed and add it to Cerebro
+    cerebro.adddata(EMAPandasData(dataname=data_df))
+    _configure(cerebro)
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    
+    # Add a strategy with the specified MAX value
+    cerebro.addstrategy(TestStrategy, MAX=max_trades)
+    
+    # Run the backtest
+    results = cerebro.run() 
+    
+    # Access the strategy instance to get open trade profit and trade count
+    strategy = results[0]
+    trade_count = getattr(strategy, 'trade_count', 0)
+    max_drawdown = getattr(strategy, 'max_drawdown', 0)
+    drawdown_analysis = results[0].analyzers.drawdown.get_analysis()
+
+    
+    # Calculate performance metrics
+    final_value = cerebro.broker.getvalue()        
+    realized_profit_percent = ((final_value - INITIAL_VALUE) / INITIAL_VALUE) * 100
+    
+    current_price = float(data_df['close'].values[-1])
+    entries = np.fromiter(strategy.open_positions, dtype=np.float64, count=len(strategy.open_positions))
+    unrealized_profit_percent = float(((current_price - entries) / entries).sum() * 100)
+   
+    return {
+        "Asset": symbol,
+        "Timeframe": tf_name,
+        "Realized Profit (%)": f"{realized_profit_percent:.2f}",
+        "Unrealized Profit (%)": f"{unrealized_profit_percent:.2f}",
+        "Trades": trade_count,
+        "Max Drawdown (%)": f"{max_drawdown:.2f}",
+        "DrawdownAnalysis (%)": f"{drawdown_analysis['max']['drawdown']:.2f}", 
+    }
+
+# Function to run backtests for several MAX values in parallel
+def run_backtests(max_values):
+    # Load the data once in this process; workers receive it when they start
+    frames = {
+        (symbol, tf_name): data_df
+        for symbol in SYMBOLS
+        for tf_name, data_df in load_frames(symbol).items()
+    }
+    
+    # Every (MAX, symbol, timeframe) backtest is independent
+    tasks = list(itertools.product(max_values, SYMBOLS, TIMEFRAMES))
+    max_workers = min(len(tasks), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(frames,)) as executor:
+        rows = list(executor.map(_one, *zip(*tasks)))
+    
+    # Group the rows into one results table per MAX value
+    results = {max_trades: [] for max_trades in max_values}
+    for (max_trades, _, _), row in zip(tasks, rows):
+        results[max_trades].append(row)
+    
+    return results
 
 # Function to run backtest for a given MAX value
 def run_backtest(max_trades):
-    # Initialize Cerebro
-    cerebro = bt.Cerebro()
+    return run_backtests([max_trades])[max_trades]
+
+if __name__ == '__main__':
+    # Run backtests for MAX = 5, 3, 8 and 13
+    all_results = run_backtests([5, 3, 8, 13])
     
-    # List of symbols and timeframes
-    symbols = ['BTC-USD', 'ETH-USD', 'LINK-USD']
-    timeframes = {'1D': '1d', '4H': '4h', '8H': '8h'}
-    
-    # List to store results
-    results_table = []
-    
-    # Loop through each symbol and timeframe
-    for symbol in symbols:
-        for tf_name, tf_interval in timeframes.items():
-            # Download hourly data using yfinance
-            data_df = yf.download(symbol, start='2024-01-01', end='2025-01-01', interval='1h', progress=False)
-            
-            # Handle Multi-Level Index
-            if isinstance(data_df.columns, pd.MultiIndex):
-                data_df.columns = data_df.columns.get_level_values(0)
-            
-            # Convert column names to lowercase for Backtrader
-            data_df.columns = [col.lower() for col in data_df.columns]
-            
-            # Resample data for 4H and 8H timeframes
-            if tf_interval in ['4h', '8h']:
-                resampled_tf = '4h' if tf_interval == '4h' else '8h'
-                data_df = resample_data(data_df, resampled_tf)
-            
-            # Create Backtrader Data Feed
-            data = bt.feeds.PandasData(dataname=data_df)
-            
-            # Add data to Cerebro
-            cerebro.adddata(data)
-
-            cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-            
-            # Set initial cash
-            initial_value = 100000.0
-            cerebro.broker.setcash(initial_value)
-
-            # Set commission to 0.1%
-            cerebro.broker.setcommission(commission=0.001)
-            
-            # Add a strategy with the specified MAX value
-            cerebro.addstrategy(TestStrategy, MAX=max_trades)
-            
-            # Run the backtest
-            results = cerebro.run() 
-            
-            # Access the strategy instance to get open trade profit and trade count
-            strategy = results[0]
-            trade_count = getattr(strategy, 'trade_count', 0)
-            max_drawdown = getattr(strategy, 'max_drawdown', 0)
-            drawdown_analysis = results[0].analyzers.drawdown.get_analysis()
-
-            
-            # Calculate performance metrics
-            final_value = cerebro.broker.getvalue()        
-            realized_profit_percent = ((final_value - initial_value) / initial_value) * 100
-            
-            current_price = data_df['close'].iloc[-1]
-            unrealized_profit = sum((current_price - entry_price) / entry_price * 100 for entry_price in strategy.open_positions)
-            unrealized_profit_percent = unrealized_profit       
-           
-            # Append results to the table
-            results_table.append({
-                "Asset": symbol,
-                "Timeframe": tf_name,
-                "Realized Profit (%)": f"{realized_profit_percent:.2f}",
-                "Unrealized Profit (%)": f"{unrealized_profit_percent:.2f}",
-                "Trades": trade_count,
-                "Max Drawdown (%)": f"{max_drawdown:.2f}",
-                "DrawdownAnalysis (%)": f"{drawdown_analysis['max']['drawdown']:.2f}", 
-            })
-            
-            # Reset Cerebro for the next iteration
-            cerebro = bt.Cerebro()
-    
-    return results_table
-
-# Run backtests for MAX = 5 and MAX = 3
-results_max_5 = run_backtest(max_trades=5)
-results_max_3 = run_backtest(max_trades=3)
-
-results_max_8 = run_backtest(max_trades=8)
-results_max_13 = run_backtest(max_trades=13)
-
-# Print results for MAX = 5
-print("\nResults for MAX = 5:")
-print(tabulate(results_max_5, headers="keys", tablefmt="grid"))
-
-# Print results for MAX = 3
-print("\nResults for MAX = 3:")
-print(tabulate(results_max_3, headers="keys", tablefmt="grid"))
-
-# Print results for MAX = 8
-print("\nResults for MAX = 8:")
-print(tabulate(results_max_8, headers="keys", tablefmt="grid"))
-
-# Print results for MAX = 13
-print("\nResults for MAX = 13:")
-print(tabulate(results_max_13, headers="keys", tablefmt="grid"))
\ No newline at end of file
+    # Print results for each MAX value
+    for max_trades, results_table in all_results.items():
+        print(f"\nResults for MAX = {max_trades}:")
+        print(tabulate(results_table, headers="keys", tablefmt="grid"))
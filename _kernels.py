@@ -0,0 +1,49 @@
+import os
+import numpy as np
+from numba import njit
+
+# Numba kernels for the backtest script.
+#
+# Build them ahead of time once with `python _kernels.py`; this writes the
+# bt_kernels extension module next to this file, which the backtest imports
+# so that no process (including pool workers) pays any JIT compilation cost.
+# Without the extension the JIT versions below are used. They are compiled
+# eagerly at import from their signatures, so forked workers inherit them.
+
+# Maximum drawdown (in percent) of an equity curve in a single pass
+@njit('f8(f8[:])', cache=True)
+def max_drawdown(eq):
+    if eq.shape[0] == 0:
+        return 0.0
+    peak = eq[0]
+    mdd = 0.0
+    for i in range(eq.shape[0]):
+        if eq[i] > peak:
+            peak = eq[i]
+        dd = (eq[i] - peak) / peak
+        if dd < mdd:
+            mdd = dd
+    return mdd * 100.0
+
+# EMA seeded with the SMA of the first `period` values, like backtrader's indicator
+@njit('f8[:](f8[:], i8)', cache=True)
+def ema(values, period):
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] < period:
+        return out
+    alpha = 2.0 / (period + 1)
+    prev = values[:period].sum() / period
+    out[period - 1] = prev
+    for i in range(period, values.shape[0]):
+        prev = prev * (1.0 - alpha) + values[i] * alpha
+        out[i] = prev
+    return out
+
+if __name__ == '__main__':
+    from numba.pycc import CC
+
+    cc = CC('bt_kernels')
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+    cc.export('max_drawdown', 'f8(f8[:])')(max_drawdown.py_func)
+    cc.export('ema', 'f8[:](f8[:], i8)')(ema.py_func)
+    cc.compile()
@@ -1,12 +1,22 @@
 import yfinance as yf
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from tabulate import tabulate
 import os
-import pickle
+import json
+import re
 
-# Cache file name
-CACHE_FILE = "crypto_data_cache.pkl"
+# Cache directory: one Parquet file per ticker plus a small metadata file
+CACHE_DIR = "crypto_cache"
+CACHE_META_FILE = os.path.join(CACHE_DIR, "meta.json")
+
+# Matches ANSI color codes, which take no space when printed
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+# ANSI color prefixes indexed by shade (0 = white, 255 = full green/red)
+_GREEN = np.array([f"\033[38;2;{255 - i};255;{255 - i}m" for i in range(256)])  # Green gradient (light to dark)
+_RED = np.array([f"\033[38;2;255;{255 - i};{255 - i}m" for i in range(256)])  # Red gradient (light to dark)
+_RESET = "\033[0m"  # Reset color after each cell
 
 # Step 1: Fetch top crypto assets by market cap (weekly performance)
 def get_top_crypto_assets():
@@ -18,28 +28,37 @@ def get_top_crypto_assets():
         "ALGO-USD", "FTT-USD", "VET-USD", "FIL-USD", "AAVE-USD"
     ]
     
-    # Check if cached data exists and is recent
-    if os.path.exists(CACHE_FILE):
+    # Check if cached data exists and is recent (only the metadata file is read for this)
+    if os.path.exists(CACHE_META_FILE):
         try:
-            with open(CACHE_FILE, "rb") as f:
-                cached_data = pickle.load(f)
+            with open(CACHE_META_FILE) as f:
+                meta = json.load(f)
             
             # Check if the cached data is less than 1 day old
-            if datetime.now() - cached_data["timestamp"] < timedelta(days=1):
+            if datetime.now() - datetime.fromisoformat(meta["timestamp"]) < timedelta(days=1):
                 print("Using cached data...")
-                return cached_data["data"]
+                return {
+                    ticker: pd.read_parquet(os.path.join(CACHE_DIR, f"{ticker}.parquet"), engine='pyarrow')
+                    for ticker in meta["tickers"]
+                }
         except Exception as e:
             print(f"Failed to load cache: {e}")
-            cached_data = None
     
     # Fetch fresh data if no valid cache exists
     print("Fetching fresh data from yfinance...")
     end_date = datetime.now()
     start_date = end_date - timedelta(days=4 * 365)  # Last 4 years
     
+    # Download all tickers in a single request instead of one per ticker
+    all_data = yf.download(" ".join(crypto_tickers), start=start_date, end=end_date, interval="1wk",
+                           group_by='ticker', threads=True)
+    
     crypto_data = {}
     for ticker in crypto_tickers:
-        data = yf.download(ticker, start=start_date, end=end_date, interval="1wk")
+        if ticker not in all_data.columns.get_level_values(0):
+            print(f"No data available for {ticker}.")
+            continue
+        data = all_data[ticker].dropna(how='all')
         if not data.empty:
             # Ensure the data has at least 4 years of weekly data
             if len(data) >= 200:  # Roughly 4 years of weekly data (52 weeks/year * 4 years)
@@ -49,17 +68,27 @@ def get_top_crypto_assets():
         else:
             print(f"No data available for {ticker}.")
     
-    # Save fetched data to cache with explicit protocol version
+    # Save fetched data to cache, writing the metadata last so a partial write is never used
     try:
-        with open(CACHE_FILE, "wb") as f:
-            pickle.dump({"timestamp": datetime.now(), "data": crypto_data}, f, protocol=4)  # Use protocol 4
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for ticker, data in crypto_data.items():
+            data.to_parquet(os.path.join(CACHE_DIR, f"{ticker}.parquet"), engine='pyarrow', compression='zstd')
+        with open(CACHE_META_FILE, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "tickers": list(crypto_data)}, f)
     except Exception as e:
         print(f"Failed to save cache: {e}")
     
     return crypto_data
 
+# Align per-asset performance Series by position into one wide DataFrame (one row per asset)
+def to_wide(performance_list, tickers, prefix):
+    wide_df = pd.concat(performance_list, axis=1, keys=tickers).T
+    wide_df.columns = [f"{prefix}_{i}" for i in range(1, wide_df.shape[1] + 1)]  # Use proper naming convention
+    return wide_df
+
 # Step 2: Calculate weekly, quarterly, and yearly performance
 def calculate_performance(crypto_data):
+    tickers = []
     all_weekly_performance = []
     all_quarterly_performance = []
     all_yearly_performance = []
@@ -74,17 +103,14 @@ def calculate_performance(crypto_data):
             print(f"Skipping {ticker} due to missing 'Close' column.")
             continue
         
+        tickers.append(ticker)
+        
         # Calculate weekly performance
         weekly_performance = data["Close"].pct_change() * 100  # Percentage change between weeks
         weekly_performance = weekly_performance.dropna()  # Drop NaN values (first week has no prior week)
         
-        # Store weekly performance
-        for idx, performance in enumerate(weekly_performance, start=1):
-            all_weekly_performance.append({
-                "Asset": ticker,
-                "Week": f"Week_{idx}",  # Use proper naming convention
-                "Weekly Performance (%)": performance
-            })
+        # Store weekly performance, numbered by position (Week_1 is the asset's first week)
+        all_weekly_performance.append(weekly_performance.reset_index(drop=True))
         
         # Group data into quarters (every 3 weeks) and calculate quarterly performance
         quarterly_data = data["Close"].resample("3W").last()  # Resample to 3-week intervals
@@ -92,12 +118,7 @@ def calculate_performance(crypto_data):
         quarterly_performance = quarterly_performance.dropna()
         
         # Store quarterly performance
-        for q_idx, performance in enumerate(quarterly_performance, start=1):
-            all_quarterly_performance.append({
-                "Asset": ticker,
-                "Quarter": f"Quarter_{q_idx}",  # Use proper naming convention
-                "Quarterly Performance (%)": performance
-            })
+        all_quarterly_performance.append(quarterly_performance.reset_index(drop=True))
         
         # Group data into years (every 52 weeks) and calculate yearly performance
         yearly_data = data["Close"].resample("52W").last()  # Resample to 52-week intervals
@@ -105,64 +126,56 @@ def calculate_performance(crypto_data):
         yearly_performance = yearly_performance.dropna()
         
         # Store yearly performance
-        for y_idx, performance in enumerate(yearly_performance, start=1):
-            all_yearly_performance.append({
-                "Asset": ticker,
-                "Year": f"Year_{y_idx}",  # Use proper naming convention
-                "Yearly Performance (%)": performance
-            })
-    
-    # Create DataFrames for weekly, quarterly, and yearly performance
-    weekly_df = pd.DataFrame(all_weekly_performance)
-    quarterly_df = pd.DataFrame(all_quarterly_performance)
-    yearly_df = pd.DataFrame(all_yearly_performance)
-    
-    # Pivot the DataFrames to wide format
-    wide_weekly_df = weekly_df.pivot(index="Asset", columns="Week", values="Weekly Performance (%)")
-    wide_quarterly_df = quarterly_df.pivot(index="Asset", columns="Quarter", values="Quarterly Performance (%)")
-    wide_yearly_df = yearly_df.pivot(index="Asset", columns="Year", values="Yearly Performance (%)")
+        all_yearly_performance.append(yearly_performance.reset_index(drop=True))
+    
+    # Build the wide DataFrames with a single concat each
+    wide_weekly_df = to_wide(all_weekly_performance, tickers, "Week")
+    wide_quarterly_df = to_wide(all_quarterly_performance, tickers, "Quarter")
+    wide_yearly_df = to_wide(all_yearly_performance, tickers, "Year")
     
     # Combine all performance metrics into a single DataFrame
     combined_df = pd.concat([wide_weekly_df, wide_quarterly_df, wide_yearly_df], axis=1)
+    combined_df.index.name = "Asset"
     
     return combined_df
 
 # Step 3: Apply color coding to the table
 def apply_color_coding(wide_df):
-    def get_color(value):
-        if pd.isnull(value):  # Handle missing values
-            return "\033[38;2;255;255;255m"  # White for missing values
-        if value > 0:
-            # Green gradient (light to dark)
-            intensity = 255-min(255, int(255 * (value / 100)))
-            return f"\033[38;2;{intensity};255;{intensity}m"
-        elif value < 0:
-            # Red gradient (light to dark)
-            intensity = 255-min(255, int(255 * (-value / 100)))
-            return f"\033[38;2;255;{intensity};{intensity}m"
-        else:
-            # Neutral (white)
-            return "\033[38;2;255;255;255m"
-    
-    # Apply color coding to each cell
-    colored_rows = []
-    for asset in wide_df.index:
-        row = [asset]  # Start with the asset name
-        for val in wide_df.loc[asset]:
-            color = get_color(val)
-            reset_color = "\033[0m"  # Reset color after each cell
-            if pd.notnull(val):
-                row.append(f"{color}{val:.2f}%{reset_color}")
-            else:
-                row.append("")  # Empty string for missing values
-        colored_rows.append(row)
+    # Pick a color for every cell at once
+    values = wide_df.to_numpy(dtype=np.float64)
+    missing = np.isnan(values)
+    values = np.where(missing, 0.0, values)
+    shade = np.minimum(255, (255 * (np.abs(values) / 100)).astype(np.int64))
+    colors = np.where(values < 0, _RED[shade], _GREEN[shade])  # Zero maps to white
+    
+    # Format all cells, leaving an empty string for missing values
+    cells = np.char.add(np.char.add(colors, np.char.mod("%.2f%%", values)), _RESET)
+    cells = np.where(missing, "", cells)
+    
+    # Start each row with the asset name
+    colored_rows = [[asset] + row for asset, row in zip(wide_df.index, cells.tolist())]
     
     return colored_rows
 
 # Step 4: Display the table
 def display_table(colored_rows, wide_df):
     headers = ["Asset"] + list(wide_df.columns)
-    print(tabulate(colored_rows, headers=headers, tablefmt="grid"))
+    
+    # Measure the visible length of every cell once, ignoring color codes
+    header_lengths = [len(header) for header in headers]
+    row_lengths = [[len(_ANSI_RE.sub("", cell)) for cell in row] for row in colored_rows]
+    widths = [max([length + 2, *lengths]) for length, *lengths in zip(header_lengths, *row_lengths)]  # Same header padding as tabulate
+    
+    # Left-align each cell by padding it to its column width (grid layout)
+    def format_row(cells, lengths):
+        return "| " + " | ".join(cell + " " * (width - length) for cell, length, width in zip(cells, lengths, widths)) + " |"
+    
+    separator = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    lines = [separator, format_row(headers, header_lengths), separator.replace("-", "=")]
+    for row, lengths in zip(colored_rows, row_lengths):
+        lines.append(format_row(row, lengths))
+        lines.append(separator)
+    print("\n".join(lines))
 
 # Main execution
 crypto_data = get_top_crypto_assets()
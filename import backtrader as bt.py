@@ -79,7 +79,7 @@ def resample_data(data_df, timeframe):
         'close': 'last',
         'volume': 'sum'
     }
-    return data_df.resample(timeframe).apply(ohlc_dict).dropna()
+    return data_df.resample(timeframe).agg(ohlc_dict).dropna()
 
 # Initialize Cerebro
 cerebro = bt.Cerebro()